@@ -2,7 +2,8 @@
 """
 Generate Web-Ready Raster Tiles for Field Validator App
 
-Converts GeoTIFF raster layers to XYZ PNG tiles for use in MapLibre GL JS.
+Converts GeoTIFF raster layers to XYZ PNG tiles (or MBTiles, see TILE_FORMAT)
+for use in MapLibre GL JS.
 Creates tiles at appropriate zoom levels for Western Ghats region.
 
 Layers included:
@@ -27,6 +28,18 @@ from pathlib import Path
 from dataclasses import dataclass
 from typing import List, Dict, Optional, Tuple
 import math
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+# Numba is optional: when present the continuous-gradient colorization runs
+# as a fused, parallel JIT kernel instead of several full-raster NumPy passes
+try:
+    import numpy as np
+    from numba import config as numba_config, njit, prange, set_num_threads
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
 
 # Configuration
 WORKSPACE = Path(r"c:\Users\trkumar\OneDrive - Deloitte (O365D)\Documents\Research\Western Ghats")
@@ -44,6 +57,27 @@ WG_BOUNDS = {
 # Zoom levels to generate (8-14 covers district to village level)
 ZOOM_LEVELS = [8, 9, 10, 11, 12, 13]
 
+# XYZ tile grid (EPSG:3857)
+TILE_SIZE = 256
+WEB_MERCATOR_EXTENT = 20037508.342789244  # Half the world width in metres
+
+# Tile storage: 'xyz' writes one PNG per tile (gdal2tiles when available),
+# 'mbtiles' packs each layer's tiles into a single {layer_id}.mbtiles file
+TILE_FORMAT = 'xyz'
+
+# Favour encode speed over file size when writing PNGs; outputs can be
+# recompressed offline (e.g. `oxipng -o 2 tiles/images/*.png`) if needed
+PNG_SAVE_OPTIONS = {'optimize': False, 'compress_level': 1}
+
+# GDAL settings applied around raster reads (1 GB block cache, multithreaded
+# decoding/warping, cached file reads); _init_worker splits them per worker
+GDAL_ENV_OPTIONS = {
+    'GDAL_CACHEMAX': 1024 * 1024 * 1024,
+    'GDAL_NUM_THREADS': 'ALL_CPUS',
+    'VSI_CACHE': 'YES',
+    'VSI_CACHE_SIZE': 256 * 1024 * 1024,
+}
+
 # Color schemes for different layer types
 COLOR_SCHEMES = {
     'lulc': {
@@ -87,6 +121,142 @@ COLOR_SCHEMES = {
     }
 }
 
+
+def _hex_to_rgba(color: str, alpha: int = 180) -> Optional[Tuple[int, int, int, int]]:
+    """Parse a '#RRGGBB' color into an RGBA tuple (None for transparent)"""
+    if color == 'transparent':
+        return None
+    return (int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16), alpha)
+
+
+# Color schemes pre-parsed to RGBA tuples once at import time
+COLOR_SCHEMES_RGBA = {
+    scheme: {value: _hex_to_rgba(color) for value, color in colors.items()}
+    for scheme, colors in COLOR_SCHEMES.items()
+}
+
+if HAS_NUMBA:
+    # No fastmath: it lets the compiler drop the NaN and nodata checks
+    @njit(parallel=True, cache=True)
+    def _gradient_rgba(data, out, nodata, min_v, max_v):
+        """Write a green gradient into out for valid pixels of continuous data"""
+        scale = max_v - min_v
+        for i in prange(data.shape[0]):
+            for j in range(data.shape[1]):
+                v = data[i, j]
+                # NaN fails both comparisons below, so skip it explicitly
+                if np.isnan(v) or v == nodata or v <= 0:
+                    continue
+                n = (v - min_v) / scale
+                if n < 0:
+                    n = 0.0
+                elif n > 1:
+                    n = 1.0
+                out[i, j, 0] = np.uint8(50 * (1 - n))
+                out[i, j, 1] = np.uint8(100 + 155 * n)
+                out[i, j, 2] = np.uint8(50 * (1 - n))
+                out[i, j, 3] = 180
+else:
+    def _gradient_rgba(data, out, nodata, min_v, max_v):
+        """Write a green gradient into out for valid pixels of continuous data"""
+        import numpy as np
+        valid_mask = (data > 0) & (data != nodata)
+        normalized = (data[valid_mask].astype(float) - min_v) / (max_v - min_v)
+        normalized = np.clip(normalized, 0, 1)
+        out[valid_mask, 0] = (50 * (1 - normalized)).astype(np.uint8)
+        out[valid_mask, 1] = (100 + 155 * normalized).astype(np.uint8)
+        out[valid_mask, 2] = (50 * (1 - normalized)).astype(np.uint8)
+        out[valid_mask, 3] = 180
+
+
+def _build_color_lut(colors: Dict):
+    """Build a 256-entry RGBA lookup table from a pre-parsed color scheme"""
+    import numpy as np
+    
+    lut = np.zeros((256, 4), dtype=np.uint8)
+    for value, rgba in colors.items():
+        if rgba is not None:
+            lut[value] = rgba
+    return lut
+
+
+def _continuous_value_range(reader, nodata) -> Optional[Tuple[float, float]]:
+    """Find the range of valid values of a continuous layer, block by block"""
+    min_val = max_val = None
+    for _, window in reader.block_windows(1):
+        block = reader.read(1, window=window)
+        valid_mask = (block > 0) & (block != nodata if nodata else True)
+        if valid_mask.any():
+            block_min = block[valid_mask].min()
+            block_max = block[valid_mask].max()
+            min_val = block_min if min_val is None else min(min_val, block_min)
+            max_val = block_max if max_val is None else max(max_val, block_max)
+    if min_val is None or max_val <= min_val:
+        return None
+    return float(min_val), float(max_val)
+
+
+def _transparent_index(lut) -> int:
+    """First lookup table index that is fully transparent"""
+    import numpy as np
+    
+    return int(np.flatnonzero(lut[:, 3] == 0)[0])
+
+
+def _index_block(block, color_scheme: str, lut, nodata):
+    """Map a block of class values to lookup table indices, hiding pixels
+    that should not be drawn behind a fully transparent index"""
+    import numpy as np
+    
+    hidden = np.zeros(block.shape, dtype=bool)
+    if block.dtype.kind == 'f':
+        # NaN has no defined uint8 cast: hide it and cast a 0 in its place
+        nan_mask = np.isnan(block)
+        if nan_mask.any():
+            hidden |= nan_mask
+            block = np.where(nan_mask, 0, block)
+    indices = np.clip(block, 0, 255).astype(np.uint8)
+    if block.dtype != np.uint8:
+        # Values outside the LUT range have no class color
+        hidden |= (block < 0) | (block > 255)
+    # Set nodata to transparent
+    if nodata is not None:
+        hidden |= block == nodata
+    # Also set 0 to transparent for classification layers
+    if color_scheme in ['plantation', 'old_growth', 'forest_class']:
+        hidden |= block == 0
+    indices[hidden] = _transparent_index(lut)
+    return indices
+
+
+def _colorize_block(block, color_scheme: str, lut, nodata, value_range: Optional[Tuple[float, float]]):
+    """Convert a block of raster values to RGBA using the scheme's lookup table"""
+    import numpy as np
+    
+    if lut is not None:
+        rgba = lut[_index_block(block, color_scheme, lut, nodata)]
+    else:
+        rgba = np.zeros(block.shape + (4,), dtype=np.uint8)
+        if nodata is not None:
+            rgba[block == nodata] = 0
+    
+    # Continuous data - green gradient over the layer-wide value range;
+    # values <= 0 and nodata are skipped, so 0 stands in for a missing nodata value
+    if value_range is not None:
+        _gradient_rgba(block, rgba, nodata if nodata is not None else 0, *value_range)
+    
+    return rgba
+
+
+def _palette_image(indices, lut):
+    """Build a palette-mode PNG image whose tRNS chunk carries the LUT alpha"""
+    from PIL import Image
+    
+    img = Image.fromarray(indices)
+    img.putpalette(lut.tobytes(), 'RGBA')
+    return img
+
+
 @dataclass
 class RasterLayer:
     """Configuration for a raster layer to be tiled"""
@@ -194,58 +364,135 @@ def get_raster_layers() -> List[RasterLayer]:
     return layers
 
 
+def is_up_to_date(output: Path, source: Path) -> bool:
+    """Check if an output exists and is at least as new as its source"""
+    return output.exists() and output.stat().st_mtime >= source.stat().st_mtime
+
+
 def check_gdal():
-    """Check if GDAL tools are available"""
+    """Check if the GDAL Python utilities (gdal2tiles) are available"""
     try:
-        result = subprocess.run(['gdal2tiles.py', '--version'], 
-                              capture_output=True, text=True)
+        from osgeo_utils import gdal2tiles
         return True
-    except FileNotFoundError:
-        try:
-            result = subprocess.run(['python', '-m', 'osgeo_utils.gdal2tiles', '--version'],
-                                  capture_output=True, text=True)
-            return True
-        except:
-            return False
+    except ImportError:
+        return False
+
+
+def ensure_cog(source: Path) -> Path:
+    """
+    Return a Cloud-Optimized GeoTIFF copy of a source raster with internal
+    overviews, so low zoom levels read pre-decimated data. The copy is
+    cached in TEMP_DIR and rebuilt when the source changes.
+    """
+    from osgeo import gdal
+    
+    cog_path = TEMP_DIR / 'cog' / f"{source.stem}.cog.tif"
+    if is_up_to_date(cog_path, source):
+        return cog_path
+    
+    cog_path.parent.mkdir(parents=True, exist_ok=True)
+    print(f"  Converting to COG: {cog_path.name}")
+    try:
+        ds = gdal.Translate(
+            str(cog_path), str(source), format='COG',
+            creationOptions=['COMPRESS=ZSTD', 'OVERVIEWS=AUTO', 'BLOCKSIZE=512',
+                             'RESAMPLING=NEAREST']  # Keep class values intact
+        )
+    except RuntimeError as e:
+        ds = None
+        print(f"  Error: {e}")
+    if ds is None:
+        print("  Warning: COG conversion failed, tiling the original source")
+        return source
+    ds = None  # Close to flush the file
+    return cog_path
 
 
 def generate_tiles_with_gdal(layer: RasterLayer, output_dir: Path) -> bool:
-    """Generate XYZ tiles using gdal2tiles"""
+    """Generate XYZ tiles using gdal2tiles, run in-process"""
+    from osgeo_utils import gdal2tiles
+    
     layer_dir = output_dir / layer.id
+    # Written only after gdal2tiles succeeds, so an interrupted run's partial
+    # pyramid is regenerated rather than treated as up to date
+    complete_marker = layer_dir / '.tiles-complete'
+    
+    if is_up_to_date(complete_marker, layer.source_path):
+        print("  Tiles up to date, skipping")
+        return True
+    
     layer_dir.mkdir(parents=True, exist_ok=True)
+    complete_marker.unlink(missing_ok=True)
     
     # Create VRT with color interpretation for visualization
     # This is a simplified approach - for production, you'd want proper color mapping
     zoom_str = f"{min(ZOOM_LEVELS)}-{max(ZOOM_LEVELS)}"
     
-    cmd = [
-        'gdal2tiles.py',
+    argv = [
+        'gdal2tiles',
         '-z', zoom_str,
         '-w', 'none',  # No web viewer
-        '-r', 'near',   # Nearest neighbor resampling
+        '-r', 'near',   # Nearest neighbor resampling (no querysize oversampling)
         '--xyz',        # XYZ tile scheme
-        str(layer.source_path),
+        '--tilesize', '256',
+        '--processes', str(os.cpu_count() or 1),  # Multicore tiling
+        str(ensure_cog(layer.source_path)),
         str(layer_dir)
     ]
     
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
-        if result.returncode != 0:
-            print(f"  Warning: gdal2tiles returned non-zero: {result.stderr}")
+        # Older GDAL releases return None on success, newer ones return 0
+        result = gdal2tiles.main(argv)
+        if result not in (None, 0):
+            print(f"  Warning: gdal2tiles returned non-zero: {result}")
             return False
+        complete_marker.touch()
         return True
-    except subprocess.TimeoutExpired:
-        print(f"  Timeout generating tiles for {layer.id}")
+    except SystemExit as e:
+        # gdal2tiles exits on invalid arguments or unreadable input
+        print(f"  Warning: gdal2tiles exited with status {e.code}")
         return False
     except Exception as e:
         print(f"  Error: {e}")
         return False
 
 
-def generate_tiles_fallback(layer: RasterLayer, output_dir: Path) -> bool:
-    """Fallback tile generation using pure Python with rasterio/PIL"""
+def _open_mbtiles(path: Path, layer: RasterLayer, bounds: Tuple[float, float, float, float]):
+    """Create an empty MBTiles database for a layer's tiles"""
+    import sqlite3
+    
+    if path.exists():
+        path.unlink()
+    conn = sqlite3.connect(str(path))
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE metadata (name TEXT, value TEXT)')
+    conn.execute('CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, '
+                 'tile_row INTEGER, tile_data BLOB)')
+    conn.execute('CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)')
+    conn.executemany('INSERT INTO metadata VALUES (?, ?)', [
+        ('name', layer.title),
+        ('description', layer.description),
+        ('format', 'png'),
+        ('type', 'overlay'),
+        ('bounds', ','.join(str(b) for b in bounds)),
+        ('minzoom', str(min(ZOOM_LEVELS))),
+        ('maxzoom', str(max(ZOOM_LEVELS))),
+    ])
+    return conn
+
+
+def generate_tiles_fallback(layer: RasterLayer, output_dir: Path, use_mbtiles: bool = False) -> bool:
+    """
+    Fallback tile generation using pure Python with rasterio/PIL.
+    With use_mbtiles, tiles are stored in a single {layer.id}.mbtiles SQLite
+    file instead of one PNG file per tile.
+    """
+    import io
     try:
         import rasterio
+        from rasterio.vrt import WarpedVRT
+        from rasterio.warp import transform_bounds, Resampling
+        from rasterio.transform import from_bounds
         from PIL import Image
         import numpy as np
     except ImportError:
@@ -253,35 +500,53 @@ def generate_tiles_fallback(layer: RasterLayer, output_dir: Path) -> bool:
         subprocess.run([sys.executable, '-m', 'pip', 'install', 'rasterio', 'pillow', 'numpy'], 
                       capture_output=True)
         import rasterio
+        from rasterio.vrt import WarpedVRT
+        from rasterio.warp import transform_bounds, Resampling
+        from rasterio.transform import from_bounds
         from PIL import Image
         import numpy as np
     
     layer_dir = output_dir / layer.id
-    layer_dir.mkdir(parents=True, exist_ok=True)
+    if use_mbtiles:
+        output_dir.mkdir(parents=True, exist_ok=True)
+    else:
+        layer_dir.mkdir(parents=True, exist_ok=True)
     
+    mbtiles = None
     try:
-        with rasterio.open(layer.source_path) as src:
-            # Read the raster data
-            data = src.read(1)
-            bounds = src.bounds
-            
-            # Get unique values for color mapping
-            unique_vals = np.unique(data[data != src.nodata])
+        # Unshared handles avoid lock contention between concurrent readers
+        with rasterio.Env(**GDAL_ENV_OPTIONS), \
+                rasterio.open(layer.source_path, sharing=False) as src:
+            # Tile ranges are computed from geographic bounds
+            west, south, east, north = transform_bounds(src.crs, 'EPSG:4326', *src.bounds)
+            nodata = src.nodata
+            if use_mbtiles:
+                mbtiles = _open_mbtiles(output_dir / f"{layer.id}.mbtiles", layer,
+                                        (west, south, east, north))
             
             # Create color lookup based on scheme
-            colors = COLOR_SCHEMES.get(layer.color_scheme, COLOR_SCHEMES['lulc'])
+            colors = COLOR_SCHEMES_RGBA.get(layer.color_scheme, COLOR_SCHEMES_RGBA['lulc'])
+            lut = _build_color_lut(colors)
+            value_range = None
+            if layer.color_scheme in ['trees', 'nature_trace']:
+                value_range = _continuous_value_range(src, nodata)
             
             # Generate tiles for each zoom level
             for zoom in ZOOM_LEVELS:
                 # Calculate tile range for this zoom
                 n = 2 ** zoom
-                x_min = int((bounds.left + 180) / 360 * n)
-                x_max = int((bounds.right + 180) / 360 * n)
-                y_min = int((1 - math.asinh(math.tan(math.radians(bounds.top))) / math.pi) / 2 * n)
-                y_max = int((1 - math.asinh(math.tan(math.radians(bounds.bottom))) / math.pi) / 2 * n)
+                x_min = int((west + 180) / 360 * n)
+                x_max = int((east + 180) / 360 * n)
+                y_min = int((1 - math.asinh(math.tan(math.radians(north))) / math.pi) / 2 * n)
+                y_max = int((1 - math.asinh(math.tan(math.radians(south))) / math.pi) / 2 * n)
+                
+                # Tile edges in Web Mercator metres, computed once per zoom
+                tile_extent = 2 * WEB_MERCATOR_EXTENT / n
+                x_edges = -WEB_MERCATOR_EXTENT + np.arange(x_min, x_max + 2) * tile_extent
+                y_edges = WEB_MERCATOR_EXTENT - np.arange(y_min, y_max + 2) * tile_extent
                 
                 zoom_dir = layer_dir / str(zoom)
-                zoom_dir.mkdir(exist_ok=True)
+                tile_rows = []
                 
                 print(f"    Zoom {zoom}: tiles {x_min}-{x_max}, {y_min}-{y_max}")
                 
@@ -291,28 +556,69 @@ def generate_tiles_fallback(layer: RasterLayer, output_dir: Path) -> bool:
                     continue
                 
                 for x in range(x_min, x_max + 1):
+                    # Column directories are created with the first visible tile
                     x_dir = zoom_dir / str(x)
-                    x_dir.mkdir(exist_ok=True)
+                    x_dir_created = False
                     
                     for y in range(y_min, y_max + 1):
-                        # Calculate tile bounds
-                        tile_lon_min = x / n * 360 - 180
-                        tile_lon_max = (x + 1) / n * 360 - 180
-                        tile_lat_max = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
-                        tile_lat_min = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+                        # Look up tile bounds from the precomputed edges
+                        tile_transform = from_bounds(
+                            x_edges[x - x_min], y_edges[y - y_min + 1],
+                            x_edges[x - x_min + 1], y_edges[y - y_min],
+                            TILE_SIZE, TILE_SIZE
+                        )
                         
-                        # Create a 256x256 PNG tile
-                        tile_path = x_dir / f"{y}.png"
+                        # Warp the source straight onto the tile grid; the
+                        # alpha band marks pixels outside the source/nodata
+                        with WarpedVRT(src, crs='EPSG:3857', transform=tile_transform,
+                                       width=TILE_SIZE, height=TILE_SIZE,
+                                       resampling=Resampling.nearest, add_alpha=True) as vrt:
+                            tile, alpha = vrt.read([1, vrt.count])
                         
-                        # For now, create placeholder transparent tiles
-                        # Full implementation would sample the raster at tile resolution
-                        img = Image.new('RGBA', (256, 256), (0, 0, 0, 0))
-                        img.save(tile_path, 'PNG')
+                        if value_range is None:
+                            # Classification tiles are written as palette PNGs
+                            pixels = _index_block(tile, layer.color_scheme, lut, nodata)
+                            pixels[alpha == 0] = _transparent_index(lut)
+                            visible = lut[pixels, 3].any()
+                        else:
+                            pixels = _colorize_block(tile, layer.color_scheme, lut, nodata, value_range)
+                            pixels[alpha == 0] = 0
+                            visible = pixels[..., 3].any()
+                        
+                        # Skip tiles with nothing to draw
+                        if not visible:
+                            continue
+                        
+                        if value_range is None:
+                            img = _palette_image(pixels, lut)
+                        else:
+                            img = Image.fromarray(pixels, 'RGBA')
+                        if use_mbtiles:
+                            # MBTiles rows follow the TMS scheme (y flipped)
+                            buf = io.BytesIO()
+                            img.save(buf, 'PNG', **PNG_SAVE_OPTIONS)
+                            tile_rows.append((zoom, x, n - 1 - y, buf.getvalue()))
+                        else:
+                            if not x_dir_created:
+                                os.makedirs(x_dir, exist_ok=True)
+                                x_dir_created = True
+                            tile_path = x_dir / f"{y}.png"
+                            img.save(tile_path, 'PNG', **PNG_SAVE_OPTIONS)
+                
+                if mbtiles is not None:
+                    with mbtiles:
+                        mbtiles.executemany('INSERT INTO tiles VALUES (?, ?, ?, ?)', tile_rows)
         
         return True
     except Exception as e:
         print(f"  Error processing {layer.id}: {e}")
         return False
+    finally:
+        if mbtiles is not None:
+            # WAL is recorded in the file header and needs -wal/-shm files,
+            # so switch back before shipping it to read-only clients
+            mbtiles.execute('PRAGMA journal_mode=DELETE')
+            mbtiles.close()
 
 
 def create_tile_manifest(layers: List[RasterLayer], output_dir: Path):
@@ -326,19 +632,28 @@ def create_tile_manifest(layers: List[RasterLayer], output_dir: Path):
     }
     
     for layer in layers:
-        layer_dir = output_dir / layer.id
-        if layer_dir.exists():
-            manifest['layers'].append({
-                'id': layer.id,
-                'title': layer.title,
-                'category': layer.category,
-                'year': layer.year,
-                'description': layer.description,
-                'color_scheme': layer.color_scheme,
-                'tile_path': f'/tiles/{layer.id}/{{z}}/{{x}}/{{y}}.png',
-                'min_zoom': min(ZOOM_LEVELS),
-                'max_zoom': max(ZOOM_LEVELS)
-            })
+        # Prefer the configured format when tiles of both kinds are on disk
+        outputs = {
+            'xyz': (output_dir / layer.id, f'/tiles/{layer.id}/{{z}}/{{x}}/{{y}}.png'),
+            'mbtiles': (output_dir / f"{layer.id}.mbtiles", f'/tiles/{layer.id}.mbtiles'),
+        }
+        formats = sorted(outputs, key=lambda f: f != TILE_FORMAT)
+        found = [f for f in formats if outputs[f][0].exists()]
+        if not found:
+            continue
+        tile_format, tile_path = found[0], outputs[found[0]][1]
+        manifest['layers'].append({
+            'id': layer.id,
+            'title': layer.title,
+            'category': layer.category,
+            'year': layer.year,
+            'description': layer.description,
+            'color_scheme': layer.color_scheme,
+            'format': tile_format,
+            'tile_path': tile_path,
+            'min_zoom': min(ZOOM_LEVELS),
+            'max_zoom': max(ZOOM_LEVELS)
+        })
     
     manifest_path = output_dir / 'tile-manifest.json'
     with open(manifest_path, 'w') as f:
@@ -348,6 +663,197 @@ def create_tile_manifest(layers: List[RasterLayer], output_dir: Path):
     return manifest
 
 
+# Per-process scratch arrays, one per purpose, reused across layers
+_SCRATCH_BUFFERS = {}
+
+
+def _scratch_buffer(name: str, shape: Tuple[int, ...], dtype):
+    """
+    Return an uninitialized, C-contiguous array of the given shape backed by
+    a reusable per-purpose buffer, which only grows when a larger array is needed
+    """
+    import numpy as np
+    
+    size = int(np.prod(shape))
+    buf = _SCRATCH_BUFFERS.get(name)
+    if buf is None or buf.dtype != np.dtype(dtype) or buf.size < size:
+        buf = np.empty(size, dtype=dtype)
+        _SCRATCH_BUFFERS[name] = buf
+    return buf[:size].reshape(shape)
+
+
+def _target_grid(src_crs, src_transform, src_width: int, src_height: int) -> Tuple:
+    """
+    Compute the WGS84 output grid (transform, width, height, bounds) for a
+    source grid, capped at 4096 px
+    """
+    import rasterio
+    from rasterio.warp import calculate_default_transform
+    from rasterio.crs import CRS
+    
+    dst_crs = CRS.from_epsg(4326)  # WGS84
+    src_bounds = rasterio.transform.array_bounds(src_height, src_width, src_transform)
+    
+    if src_crs != dst_crs:
+        transform, width, height = calculate_default_transform(
+            src_crs, dst_crs, src_width, src_height, *src_bounds,
+            resolution=(0.001, 0.001)  # ~100m resolution
+        )
+        bounds = rasterio.warp.transform_bounds(src_crs, dst_crs, *src_bounds)
+    else:
+        transform, width, height = src_transform, src_width, src_height
+        bounds = src_bounds
+    
+    # Limit dimensions up front so data is only ever read at the
+    # final image resolution
+    max_dim = 4096
+    if width > max_dim or height > max_dim:
+        scale = max_dim / max(width, height)
+        width = int(width * scale)
+        height = int(height * scale)
+        transform = rasterio.transform.from_bounds(*bounds, width, height)
+    
+    return transform, width, height, bounds
+
+
+def _init_worker(workers: int):
+    """
+    Pool initializer: give each worker an even share of the cores and of the
+    GDAL cache budgets, so concurrent layers don't each claim every core and
+    a full-size cache.
+    """
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    GDAL_ENV_OPTIONS['GDAL_NUM_THREADS'] = str(threads)
+    for key in ('GDAL_CACHEMAX', 'VSI_CACHE_SIZE'):
+        GDAL_ENV_OPTIONS[key] //= workers
+    if HAS_NUMBA:
+        set_num_threads(min(threads, numba_config.NUMBA_NUM_THREADS))
+
+
+def _process_one_layer(layer: RasterLayer, images_dir: Path, color_luts: Dict) -> Optional[Dict]:
+    """Render a single layer to a static PNG and return its manifest entry"""
+    import rasterio
+    from rasterio.warp import Resampling
+    from rasterio.vrt import WarpedVRT
+    from rasterio.crs import CRS
+    from PIL import Image
+    import numpy as np
+    
+    dst_crs = CRS.from_epsg(4326)  # WGS84
+    
+    print(f"Processing {layer.id}...")
+    try:
+        # Unshared handles avoid lock contention between concurrent readers
+        with rasterio.Env(**GDAL_ENV_OPTIONS), \
+                rasterio.open(layer.source_path, sharing=False) as src:
+            nodata = src.nodata
+            # Check if we need to reproject
+            if src.crs != dst_crs:
+                print(f"  Reprojecting from {src.crs} to WGS84...")
+            transform, width, height, bounds = _target_grid(
+                src.crs, src.transform, src.width, src.height
+            )
+            
+            if src.crs != dst_crs or (width, height) != (src.width, src.height):
+                # Warp lazily so blocks are reprojected/decimated as they are read
+                reader = WarpedVRT(src, crs=dst_crs, transform=transform,
+                                   width=width, height=height,
+                                   resampling=Resampling.nearest)
+            else:
+                reader = nullcontext(src)
+            
+            with reader as reader:
+                # Stream block windows so only one block of source values
+                # is held in memory at a time
+                windows = [window for _, window in reader.block_windows(1)]
+                
+                # Continuous layers need the layer-wide range before any
+                # block can be colored
+                value_range = None
+                if layer.color_scheme in ['trees', 'nature_trace']:
+                    value_range = _continuous_value_range(reader, nodata)
+                
+                # Classification layers only need one palette index per
+                # pixel; gradient layers are written as full RGBA. The block
+                # windows cover the whole grid, so the reused output buffer
+                # needs no clearing between layers
+                lut = color_luts.get(layer.color_scheme)
+                use_palette = lut is not None and value_range is None
+                if use_palette:
+                    pixels = _scratch_buffer('pixels', (height, width), np.uint8)
+                else:
+                    pixels = _scratch_buffer('pixels', (height, width, 4), np.uint8)
+                
+                # Value diagnostics: a histogram is O(N) for byte data,
+                # other dtypes fall back to sorting each block
+                value_counts = np.zeros(256, dtype=np.int64)
+                unique_vals = None
+                
+                # Blocks are read into one reused buffer; every read fully
+                # overwrites its slice, so the buffer is never zeroed
+                block_buf = _scratch_buffer(
+                    'block',
+                    (max(w.height for w in windows), max(w.width for w in windows)),
+                    reader.dtypes[0]
+                )
+                for window in windows:
+                    block = reader.read(1, window=window,
+                                        out=block_buf[:window.height, :window.width])
+                    if block.dtype == np.uint8:
+                        value_counts += np.bincount(block.ravel(), minlength=256)
+                    else:
+                        # Only the 10 smallest values are reported, so keep just those
+                        block_vals = np.unique(block)[:10]
+                        unique_vals = block_vals if unique_vals is None else np.union1d(unique_vals, block_vals)[:10]
+                    if use_palette:
+                        pixels[window.toslices()] = _index_block(
+                            block, layer.color_scheme, lut, nodata
+                        )
+                    else:
+                        pixels[window.toslices()] = _colorize_block(
+                            block, layer.color_scheme, lut, nodata, value_range
+                        )
+                
+                if unique_vals is None:
+                    unique_vals = np.nonzero(value_counts)[0]
+                print(f"  Unique values: {unique_vals[:10]}...")
+            
+            # Create and save image
+            if use_palette:
+                img = _palette_image(pixels, lut)
+            else:
+                img = Image.fromarray(pixels, 'RGBA')
+            
+            img_path = images_dir / f"{layer.id}.png"
+            img.save(img_path, 'PNG', **PNG_SAVE_OPTIONS)
+            
+            # Convert bounds to list format [west, south, east, north]
+            bounds_list = list(bounds) if hasattr(bounds, '__iter__') else [bounds.left, bounds.bottom, bounds.right, bounds.top]
+            
+            entry = {
+                'id': layer.id,
+                'title': layer.title,
+                'category': layer.category,
+                'year': layer.year,
+                'description': layer.description,
+                'image_path': f'/tiles/images/{layer.id}.png',
+                'bounds': {
+                    'west': bounds_list[0],
+                    'south': bounds_list[1],
+                    'east': bounds_list[2],
+                    'north': bounds_list[3]
+                }
+            }
+            print(f"  Created: {img_path.name} ({img.width}x{img.height})")
+            return entry
+            
+    except Exception as e:
+        print(f"  Error processing {layer.id}: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
 def create_static_layer_images(layers: List[RasterLayer], output_dir: Path):
     """
     Alternative approach: Create static PNG images for each layer
@@ -356,8 +862,6 @@ def create_static_layer_images(layers: List[RasterLayer], output_dir: Path):
     """
     try:
         import rasterio
-        from rasterio.warp import calculate_default_transform, reproject, Resampling
-        from rasterio.crs import CRS
         from PIL import Image
         import numpy as np
     except ImportError:
@@ -365,143 +869,48 @@ def create_static_layer_images(layers: List[RasterLayer], output_dir: Path):
         subprocess.run([sys.executable, '-m', 'pip', 'install', 'rasterio', 'pillow', 'numpy'],
                       capture_output=True)
         import rasterio
-        from rasterio.warp import calculate_default_transform, reproject, Resampling
-        from rasterio.crs import CRS
         from PIL import Image
         import numpy as np
     
     images_dir = output_dir / 'images'
     images_dir.mkdir(parents=True, exist_ok=True)
     
-    image_manifest = []
-    dst_crs = CRS.from_epsg(4326)  # WGS84
+    # Build a 256-entry RGBA lookup table per color scheme so each layer is
+    # colorized with a single gather instead of one full-array mask per class
+    color_luts = {scheme: _build_color_lut(colors) for scheme, colors in COLOR_SCHEMES_RGBA.items()}
     
+    # Reuse manifest entries of layers whose image is newer than the source
+    manifest_path = images_dir / 'image-manifest.json'
+    cached_entries = {}
+    if manifest_path.exists():
+        with open(manifest_path) as f:
+            cached_entries = {l['id']: l for l in json.load(f).get('layers', [])}
+    
+    stale_layers = []
     for layer in layers:
-        print(f"Processing {layer.id}...")
-        try:
-            with rasterio.open(layer.source_path) as src:
-                # Check if we need to reproject
-                if src.crs != dst_crs:
-                    print(f"  Reprojecting from {src.crs} to WGS84...")
-                    transform, width, height = calculate_default_transform(
-                        src.crs, dst_crs, src.width, src.height, *src.bounds,
-                        resolution=(0.001, 0.001)  # ~100m resolution
-                    )
-                    
-                    # Limit dimensions to prevent memory issues
-                    max_dim = 4096
-                    if width > max_dim or height > max_dim:
-                        scale = max_dim / max(width, height)
-                        width = int(width * scale)
-                        height = int(height * scale)
-                        transform = rasterio.transform.from_bounds(
-                            *rasterio.warp.transform_bounds(src.crs, dst_crs, *src.bounds),
-                            width, height
-                        )
-                    
-                    data = np.zeros((height, width), dtype=src.dtypes[0])
-                    reproject(
-                        source=rasterio.band(src, 1),
-                        destination=data,
-                        src_transform=src.transform,
-                        src_crs=src.crs,
-                        dst_transform=transform,
-                        dst_crs=dst_crs,
-                        resampling=Resampling.nearest
-                    )
-                    bounds = rasterio.warp.transform_bounds(src.crs, dst_crs, *src.bounds)
-                    nodata = src.nodata
-                else:
-                    # Read data directly
-                    data = src.read(1)
-                    bounds = src.bounds
-                    nodata = src.nodata
-                    height, width = data.shape
-                
-                # Create RGBA image
-                rgba = np.zeros((height, width, 4), dtype=np.uint8)
-                
-                # Apply color scheme based on data type
-                colors = COLOR_SCHEMES.get(layer.color_scheme, {})
-                
-                # Get unique values
-                unique_vals = np.unique(data)
-                print(f"  Unique values: {unique_vals[:10]}...")
-                
-                # Apply colors for each value
-                for value, color in colors.items():
-                    if color == 'transparent':
-                        continue
-                    mask = (data == value)
-                    if isinstance(color, str) and color.startswith('#'):
-                        r = int(color[1:3], 16)
-                        g = int(color[3:5], 16)
-                        b = int(color[5:7], 16)
-                        rgba[mask] = [r, g, b, 180]
-                
-                # Handle values not in color scheme with gradient for continuous data
-                if layer.color_scheme in ['trees', 'nature_trace']:
-                    # Continuous data - use gradient
-                    valid_mask = (data > 0) & (data != nodata if nodata else True)
-                    if valid_mask.any():
-                        min_val = data[valid_mask].min()
-                        max_val = data[valid_mask].max()
-                        if max_val > min_val:
-                            normalized = (data.astype(float) - min_val) / (max_val - min_val)
-                            normalized = np.clip(normalized, 0, 1)
-                            # Green gradient
-                            rgba[valid_mask, 0] = (50 * (1 - normalized[valid_mask])).astype(np.uint8)
-                            rgba[valid_mask, 1] = (100 + 155 * normalized[valid_mask]).astype(np.uint8)
-                            rgba[valid_mask, 2] = (50 * (1 - normalized[valid_mask])).astype(np.uint8)
-                            rgba[valid_mask, 3] = 180
-                
-                # Set nodata to transparent
-                if nodata is not None:
-                    rgba[data == nodata] = [0, 0, 0, 0]
-                # Also set 0 to transparent for classification layers
-                if layer.color_scheme in ['plantation', 'old_growth', 'forest_class']:
-                    rgba[data == 0] = [0, 0, 0, 0]
-                
-                # Create and save image
-                img = Image.fromarray(rgba, 'RGBA')
-                
-                # Resize if still too large
-                max_dim = 4096
-                if max(img.size) > max_dim:
-                    ratio = max_dim / max(img.size)
-                    new_size = (int(img.width * ratio), int(img.height * ratio))
-                    img = img.resize(new_size, Image.Resampling.NEAREST)
-                
-                img_path = images_dir / f"{layer.id}.png"
-                img.save(img_path, 'PNG', optimize=True)
-                
-                # Convert bounds to list format [west, south, east, north]
-                bounds_list = list(bounds) if hasattr(bounds, '__iter__') else [bounds.left, bounds.bottom, bounds.right, bounds.top]
-                
-                image_manifest.append({
-                    'id': layer.id,
-                    'title': layer.title,
-                    'category': layer.category,
-                    'year': layer.year,
-                    'description': layer.description,
-                    'image_path': f'/tiles/images/{layer.id}.png',
-                    'bounds': {
-                        'west': bounds_list[0],
-                        'south': bounds_list[1],
-                        'east': bounds_list[2],
-                        'north': bounds_list[3]
-                    }
-                })
-                print(f"  Created: {img_path.name} ({img.width}x{img.height})")
-                
-        except Exception as e:
-            print(f"  Error processing {layer.id}: {e}")
-            import traceback
-            traceback.print_exc()
-            continue
+        img_path = images_dir / f"{layer.id}.png"
+        if layer.id in cached_entries and is_up_to_date(img_path, layer.source_path):
+            print(f"Skipping {layer.id} (up to date)")
+        else:
+            stale_layers.append(layer)
+    
+    # Layers are independent (separate source and output files), so render
+    # them in parallel
+    workers = max(1, min(len(stale_layers), os.cpu_count() or 1))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(workers,)) as executor:
+        results = executor.map(_process_one_layer, stale_layers,
+                               repeat(images_dir), repeat(color_luts))
+        new_entries = dict(zip([l.id for l in stale_layers], results))
+    
+    # Keep the manifest in layer order
+    image_manifest = []
+    for layer in layers:
+        entry = new_entries[layer.id] if layer.id in new_entries else cached_entries[layer.id]
+        if entry is not None:
+            image_manifest.append(entry)
     
     # Save manifest
-    manifest_path = images_dir / 'image-manifest.json'
     with open(manifest_path, 'w') as f:
         json.dump({
             'version': '1.0',
@@ -549,22 +958,30 @@ def main():
     print(f"\n[OK] Generated {len(image_manifest)} layer images")
     print(f"\nOutput directory: {OUTPUT_DIR}")
     
-    # If GDAL is available, also generate proper XYZ tiles
-    if has_gdal:
-        print("\n" + "=" * 60)
+    # Also generate proper tiles: gdal2tiles for XYZ when GDAL is available,
+    # otherwise (or for MBTiles) the rasterio fallback tiler
+    use_mbtiles = TILE_FORMAT == 'mbtiles'
+    print("\n" + "=" * 60)
+    if has_gdal and not use_mbtiles:
         print("Generating XYZ tiles with GDAL...")
-        print("=" * 60)
-        
-        success_count = 0
-        for layer in existing_layers[:5]:  # Limit to first 5 for testing
-            print(f"\nProcessing: {layer.title}")
-            if generate_tiles_with_gdal(layer, OUTPUT_DIR):
-                success_count += 1
-                print(f"  [OK] Tiles generated")
-            else:
-                print(f"  ✗ Failed")
-        
-        print(f"\n[OK] Generated tiles for {success_count} layers")
+    else:
+        print(f"Generating {TILE_FORMAT.upper()} tiles with rasterio...")
+    print("=" * 60)
+    
+    success_count = 0
+    for layer in existing_layers[:5]:  # Limit to first 5 for testing
+        print(f"\nProcessing: {layer.title}")
+        if has_gdal and not use_mbtiles:
+            ok = generate_tiles_with_gdal(layer, OUTPUT_DIR)
+        else:
+            ok = generate_tiles_fallback(layer, OUTPUT_DIR, use_mbtiles=use_mbtiles)
+        if ok:
+            success_count += 1
+            print(f"  [OK] Tiles generated")
+        else:
+            print(f"  ✗ Failed")
+    
+    print(f"\n[OK] Generated tiles for {success_count} layers")
     
     # Create combined manifest
     create_tile_manifest(existing_layers, OUTPUT_DIR)
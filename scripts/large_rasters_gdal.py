@@ -0,0 +1,229 @@
+"""
+GDAL backend for the large-raster images.
+
+Warps (or, for WGS84 sources, decimates), colors and encodes each layer
+in-process with the osgeo bindings, chaining the steps through in-memory
+VRTs. Layer definitions and the driver live in raster_layers.py.
+"""
+
+# Imported first: raster_layers sets the GDAL env defaults
+import raster_layers
+from raster_layers import TEMP_DIR
+
+def get_raster_info(filepath):
+    """Get raster size, CRS and block layout as gdalinfo JSON"""
+    from osgeo import gdal
+    gdal.UseExceptions()
+    
+    try:
+        return gdal.Info(str(filepath), format='json')
+    except Exception as e:
+        print(f"Error getting info: {e}")
+    return None
+
+def dataset_bounds(ds):
+    """Bounds of an open, north-up GDAL dataset from its geotransform"""
+    gt = ds.GetGeoTransform()
+    return {
+        'west': gt[0],
+        'south': gt[3] + gt[5] * ds.RasterYSize,
+        'east': gt[0] + gt[1] * ds.RasterXSize,
+        'north': gt[3]
+    }
+
+def output_size(width, height, target_size):
+    """
+    GDAL width/height options that give the longer side target_size pixels
+    and derive the other from the aspect ratio (0), as the rasterio backend does
+    """
+    return (target_size, 0) if width > height else (0, target_size)
+
+def is_wgs84(info):
+    """Whether gdalinfo JSON describes a raster already in EPSG:4326"""
+    from osgeo import osr
+    
+    wkt = ((info or {}).get('coordinateSystem') or {}).get('wkt')
+    if not wkt:
+        return False
+    srs = osr.SpatialReference()
+    srs.ImportFromWkt(wkt)
+    wgs84 = osr.SpatialReference()
+    wgs84.ImportFromEPSG(4326)
+    return bool(srs.IsSame(wgs84))
+
+def ensure_tiled(source, info):
+    """
+    Return a path to an internally tiled (512x512) copy of a striped GeoTIFF,
+    so warping touches each block only once. Tiled sources are used as-is;
+    copies are cached in TEMP_DIR.
+    """
+    from osgeo import gdal
+    gdal.UseExceptions()
+    
+    bands = (info or {}).get('bands') or [{}]
+    if bands[0].get('block') == [512, 512]:
+        return source
+    
+    tiled = TEMP_DIR / 'tiled' / f"{source.stem}.tif"
+    if tiled.exists() and tiled.stat().st_mtime >= source.stat().st_mtime:
+        return tiled
+    
+    print("  Re-tiling source to 512x512 blocks...")
+    tiled.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        ds = gdal.Translate(
+            str(tiled), str(source),
+            creationOptions=['TILED=YES', 'BLOCKXSIZE=512', 'BLOCKYSIZE=512',
+                             'COMPRESS=DEFLATE', 'BIGTIFF=IF_SAFER']
+        )
+        ds = None  # Close to flush the file
+    except Exception as e:
+        print(f"  Re-tile error, using original source: {e}")
+        return source
+    return tiled
+
+
+def create_colored_png_with_gdal(layer, output_dir, target_size=4096):
+    """Create colored PNG using GDAL color-relief"""
+    source = layer['source']
+    output = output_dir / f"{layer['id']}.png"
+    color_file = output_dir / f"{layer['id']}_colors.txt"
+    
+    print(f"\nProcessing: {layer['title']}")
+    print(f"  Source: {source}")
+    
+    if not source.exists():
+        print(f"  [X] Source file not found")
+        return None
+    
+    # Get raster info
+    info = get_raster_info(source)
+    if info:
+        size = info.get('size', [0, 0])
+        print(f"  Size: {size[0]}x{size[1]}")
+    source = ensure_tiled(source, info)
+    
+    # Create color file for gdaldem
+    if 'colors' in layer:
+        colors = layer['colors']
+    else:
+        # Single color for binary masks
+        colors = {0: 'transparent', 1: layer['color']}
+    
+    with open(color_file, 'w') as f:
+        for value, color in colors.items():
+            if color == 'transparent':
+                f.write(f"{value} 0 0 0 0\n")
+            elif isinstance(color, str) and color.startswith('#'):
+                r = int(color[1:3], 16)
+                g = int(color[3:5], 16)
+                b = int(color[5:7], 16)
+                f.write(f"{value} {r} {g} {b} 180\n")
+            else:
+                # RGBA tuple
+                f.write(f"{value} {' '.join(str(c) for c in color)}\n")
+    
+    # All three steps run in-process and chain through in-memory VRTs, so
+    # the source is opened once and no intermediate raster touches disk
+    from osgeo import gdal
+    gdal.UseExceptions()
+    warped_path = f"/vsimem/{layer['id']}_warped.vrt"
+    colored_path = f"/vsimem/{layer['id']}_colored.vrt"
+    warped = colored = None
+    
+    try:
+        # Step 1: Create a VRT downsampled to the output size and in WGS84.
+        # WGS84 sources only need decimating, which translate does from
+        # block-aligned (overview) reads; others are warped straight to the
+        # output size so pixels are resampled only once
+        if is_wgs84(info):
+            print("  Creating downsampled VRT...")
+            width, height = output_size(*info['size'], target_size)
+            warped = gdal.Translate(
+                warped_path, str(source), format='VRT',
+                width=width, height=height,
+                resampleAlg='nearest'
+            )
+        else:
+            print("  Creating warped VRT...")
+            warp_options = dict(
+                format='VRT',
+                dstSRS='EPSG:4326',
+                resampleAlg='near',
+                multithread=True,
+                # This worker's share of the cores (see raster_layers.init_worker)
+                warpOptions=[f'NUM_THREADS={raster_layers.WORKER_THREADS}']
+            )
+            warped = gdal.Warp(warped_path, str(source), width=target_size, height=0,
+                               **warp_options)
+            # The aspect ratio is only known once reprojected; warped VRTs
+            # are lazy, so redoing a tall one with the height capped is cheap
+            if warped.RasterYSize > warped.RasterXSize:
+                warped = None
+                gdal.Unlink(warped_path)
+                warped = gdal.Warp(warped_path, str(source), width=0, height=target_size,
+                                   **warp_options)
+        # The color-relief VRT refers to this one by path, and a VRT's XML
+        # is only written to /vsimem on flush
+        warped.FlushCache()
+        
+        # Step 2: Apply color table as a color-relief VRT, so the colors
+        # are computed while the PNG is written. Exact entries only: the
+        # default interpolation would clamp values missing from the table
+        # (class 0, the warp's fill) to the nearest color instead of leaving
+        # them transparent like the rasterio backend's palette
+        print("  Applying colors...")
+        colored = gdal.DEMProcessing(
+            colored_path, warped, 'color-relief', format='VRT',
+            colorFilename=str(color_file), addAlpha=True,
+            colorSelection='exact_color_entry'
+        )
+        colored.FlushCache()
+        
+        # Step 3: Convert to PNG
+        print("  Converting to PNG...")
+        png = gdal.Translate(str(output), colored, format='PNG')
+        png = None  # Close to flush the file
+        
+        # Also write a Cloud-Optimized GeoTIFF (tiled, with overviews) so
+        # clients can range-read only the pixels they need
+        print("  Writing COG...")
+        cog = gdal.Translate(
+            str(output.with_suffix('.tif')), colored, format='COG',
+            creationOptions=['COMPRESS=DEFLATE', 'PREDICTOR=2', 'BLOCKSIZE=512',
+                             'OVERVIEW_RESAMPLING=NEAREST', 'BIGTIFF=IF_SAFER']
+        )
+        cog = None  # Close to flush the file
+        
+        # Get bounds from the open VRT's geotransform
+        bounds = dataset_bounds(warped)
+        
+        print(f"  [OK] Created: {output.name}")
+        
+        return {
+            'id': layer['id'],
+            'title': layer['title'],
+            'category': layer['category'],
+            'year': layer.get('year'),
+            'description': layer['description'],
+            'image_path': f'/tiles/images/{layer["id"]}.png',
+            'cog_path': f'/tiles/images/{layer["id"]}.tif',
+            'bounds': bounds
+        }
+        
+    except Exception as e:
+        print(f"  Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+    
+    finally:
+        # Cleanup temp files, closing the VRTs before unlinking them
+        colored = warped = None
+        for path in [colored_path, warped_path]:
+            if gdal.VSIStatL(path) is not None:
+                gdal.Unlink(path)
+        try:
+            color_file.unlink(missing_ok=True)
+        except OSError:
+            pass
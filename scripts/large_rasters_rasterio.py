@@ -0,0 +1,326 @@
+"""
+Rasterio backend for the large-raster images.
+
+Reads each source block by block through a WGS84 view, decimated from
+internal overviews, and writes a palette PNG plus a COG. Layer definitions
+and the driver live in raster_layers.py.
+"""
+
+import shutil
+import subprocess
+import sys
+from contextlib import nullcontext
+
+# Imported first: raster_layers sets the GDAL env defaults
+import raster_layers
+from raster_layers import LARGE_LAYERS, TEMP_DIR
+
+# Fail fast with an install hint rather than pip-installing GDAL wheels at startup
+try:
+    import rasterio
+    import rasterio.shutil
+    from rasterio.warp import Resampling
+    from rasterio.windows import Window
+    from rasterio.crs import CRS
+    from rasterio.vrt import WarpedVRT
+    from rasterio.enums import ColorInterp
+    from rasterio.transform import from_bounds
+    from PIL import Image
+    import numpy as np
+except ImportError as e:
+    sys.exit(f"Missing dependency: {e}. Install with: pip install rasterio pillow numpy")
+
+# Numba is optional: when present, blocks are colorized by a parallel JIT
+# kernel instead of a NumPy fancy-indexing pass
+try:
+    from numba import config as numba_config, njit, prange, set_num_threads
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+# Side length of the output blocks colorized at a time
+BLOCK_SIZE = 1024
+
+# Skip PIL's extra filter-search pass; when oxipng is installed it recompresses
+# the PNG afterwards (multithreaded, lossless) to recover the size
+PNG_SAVE_OPTIONS = {'optimize': False, 'compress_level': 6}
+OXIPNG = shutil.which('oxipng')
+
+# Cloud-Optimized GeoTIFF written next to each PNG: internally tiled with
+# overviews, so clients can range-read only the pixels they need
+COG_PROFILE = {
+    'driver': 'COG',
+    'dtype': 'uint8',
+    'count': 4,
+    'crs': 'EPSG:4326',
+    'compress': 'DEFLATE',
+    'predictor': 2,
+    'blocksize': 512,
+    'overview_resampling': 'nearest',
+    'BIGTIFF': 'IF_SAFER',
+}
+
+
+if HAS_NUMBA:
+    @njit(parallel=True, cache=True)
+    def to_palette_indices(data, transparent, out):
+        """Write class values into out as palette indices (values outside 0-255 get the transparent index)"""
+        h, w = data.shape
+        for i in prange(h):
+            for j in range(w):
+                v = data[i, j]
+                if v >= 0 and v < 256:
+                    out[i, j] = v
+                else:
+                    out[i, j] = transparent
+else:
+    def to_palette_indices(data, transparent, out):
+        """Write class values into out as palette indices (values outside 0-255 get the transparent index)"""
+        if data.dtype == np.uint8:
+            out[:] = data
+        else:
+            # Same test as the Numba kernel: NaN fails both comparisons there
+            inside = (data >= 0) & (data < 256)
+            out[:] = np.where(inside, data, transparent)
+
+
+def build_palette(layer):
+    """
+    Build the 256-entry RGBA PNG palette for a layer, indexed by class value
+    (class values must be 0-255; unlisted values are transparent)
+    """
+    if 'colors' in layer:
+        colors = layer['colors']
+    else:
+        # Binary mask
+        colors = {1: layer['color']}
+    
+    palette = np.zeros((256, 4), dtype=np.uint8)
+    for value, color in colors.items():
+        palette[value] = color
+    return palette
+
+
+# Colors are static, so every layer's palette is laid out once at import
+PALETTES = {layer['id']: build_palette(layer) for layer in LARGE_LAYERS}
+
+
+def overview_factors(width, height, target_size):
+    """Power-of-two overview levels that are still at least as fine as the output"""
+    max_factor = max(width, height) / target_size
+    factors = []
+    factor = 2
+    while factor <= max_factor:
+        factors.append(factor)
+        factor *= 2
+    return factors
+
+
+def ensure_tiled(source, target_size):
+    """
+    Return a path to an internally tiled (512x512) copy of the source, so
+    windowed and decimated reads touch each block only once. The source is
+    used as-is only if it is already tiled and has (or needs no) overviews;
+    otherwise the copy is cached in TEMP_DIR, where ensure_overviews may add
+    overviews to it. The source itself is never modified.
+    """
+    with rasterio.open(source) as src:
+        if (src.profile.get('tiled') and src.block_shapes[0] == (512, 512)
+                and (src.overviews(1) or not overview_factors(src.width, src.height, target_size))):
+            return source
+    
+    tiled = TEMP_DIR / 'tiled' / f"{source.stem}.tif"
+    if tiled.exists() and tiled.stat().st_mtime >= source.stat().st_mtime:
+        return tiled
+    
+    print("  Re-tiling source to 512x512 blocks...")
+    tiled.parent.mkdir(parents=True, exist_ok=True)
+    rasterio.shutil.copy(
+        source, tiled, driver='GTiff',
+        TILED='YES', BLOCKXSIZE=512, BLOCKYSIZE=512,
+        COMPRESS='DEFLATE', BIGTIFF='IF_SAFER'
+    )
+    return tiled
+
+
+def ensure_overviews(source, target_size):
+    """
+    Build internal nearest-neighbour overviews once, so downsampled reads
+    come from a pre-decimated level instead of the full-resolution raster.
+    Only working copies in TEMP_DIR are written to.
+    """
+    if TEMP_DIR not in source.parents:
+        return
+    
+    with rasterio.open(source) as src:
+        if src.overviews(1):
+            return
+        factors = overview_factors(src.width, src.height, target_size)
+    if not factors:
+        return
+    
+    print(f"  Building overviews {factors}...")
+    try:
+        with rasterio.open(source, 'r+') as dst:
+            dst.build_overviews(factors, Resampling.nearest)
+            dst.update_tags(ns='rio_overview', resampling='nearest')
+    except Exception as e:
+        print(f"  Warning: could not build overviews, reading full resolution: {e}")
+
+
+def wgs84_view(src, threads):
+    """
+    Return src reprojected to WGS84 on the fly by the multithreaded warper
+    (or src itself when it is already WGS84), so decimation and
+    reprojection happen in a single pass over the data.
+    """
+    if src.crs == CRS.from_epsg(4326):
+        return nullcontext(src)
+    return WarpedVRT(src, crs=CRS.from_epsg(4326), resampling=Resampling.nearest,
+                     num_threads=threads)
+
+
+def write_cog(path, indices, palette, bounds):
+    """Write a palette image covering WGS84 bounds as an RGBA Cloud-Optimized GeoTIFF"""
+    height, width = indices.shape
+    with rasterio.open(path, 'w', width=width, height=height,
+                       transform=from_bounds(*bounds, width, height), **COG_PROFILE) as dst:
+        # Expand one band at a time: a single one-byte-per-pixel gather per
+        # band, instead of a full RGBA array plus a transposed copy
+        for band in range(4):
+            dst.write(np.ascontiguousarray(palette[:, band])[indices], band + 1)
+        dst.colorinterp = [ColorInterp.red, ColorInterp.green, ColorInterp.blue, ColorInterp.alpha]
+
+
+def optimize_png(path):
+    """Losslessly recompress a PNG in place with oxipng"""
+    result = subprocess.run([OXIPNG, '-o', '4', '--strip', 'safe', str(path)],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"  Warning: oxipng failed, keeping PIL output: {result.stderr.strip()}")
+
+
+def process_large_raster(layer, output_dir, target_size=4096):
+    """Process a large raster using downsampling and chunked processing"""
+    source = layer['source']
+    output = output_dir / f"{layer['id']}.png"
+    
+    print(f"\nProcessing: {layer['title']}")
+    print(f"  Source: {source}")
+    
+    if not source.exists():
+        print(f"  [X] Source file not found")
+        return None
+    
+    try:
+        source = ensure_tiled(source, target_size)
+        ensure_overviews(source, target_size)
+        
+        # Threads are this worker's share of the cores (see raster_layers.init_worker)
+        threads = raster_layers.WORKER_THREADS
+        if HAS_NUMBA:
+            set_num_threads(min(threads, numba_config.NUMBA_NUM_THREADS))
+        
+        with rasterio.Env(GDAL_NUM_THREADS=str(threads)), rasterio.open(source) as raw, \
+                wgs84_view(raw, threads) as src:
+            # Get source info
+            print(f"  Original size: {raw.width} x {raw.height}")
+            print(f"  CRS: {raw.crs}")
+            src_width = src.width
+            src_height = src.height
+            
+            # Calculate output size (maintain aspect ratio, max dimension = target_size)
+            aspect = src_width / src_height
+            if src_width > src_height:
+                out_width = target_size
+                out_height = int(target_size / aspect)
+            else:
+                out_height = target_size
+                out_width = int(target_size * aspect)
+            
+            print(f"  Output size: {out_width} x {out_height}")
+            
+            # Calculate decimation factors
+            dec_x = src_width / out_width
+            dec_y = src_height / out_height
+            
+            # Read and colorize the output grid block by block, so only one
+            # block of source values is held in memory at a time. GDAL serves
+            # the decimated reads from the closest overview that is at least
+            # as fine as the output
+            print("  Reading with downsampling...")
+            palette = PALETTES.get(layer['id'])
+            if palette is None:
+                palette = build_palette(layer)
+            transparent = int(np.flatnonzero(palette[:, 3] == 0)[0])
+            indices = np.empty((out_height, out_width), dtype=np.uint8)
+            # Small unsigned types are tallied with an O(N) bincount instead
+            # of sorting every block for the unique-values diagnostic
+            dtype = np.dtype(src.dtypes[0])
+            counts = None
+            if dtype.kind == 'u' and dtype.itemsize <= 2:
+                counts = np.zeros(1 << (8 * dtype.itemsize), dtype=np.int64)
+            unique_vals = None
+            for row in range(0, out_height, BLOCK_SIZE):
+                for col in range(0, out_width, BLOCK_SIZE):
+                    block_height = min(BLOCK_SIZE, out_height - row)
+                    block_width = min(BLOCK_SIZE, out_width - col)
+                    window = Window(col * dec_x, row * dec_y,
+                                    block_width * dec_x, block_height * dec_y)
+                    block = src.read(
+                        1,
+                        window=window,
+                        out_shape=(block_height, block_width),
+                        resampling=Resampling.nearest
+                    )
+                    if counts is not None:
+                        counts += np.bincount(block.ravel(), minlength=counts.size)
+                    else:
+                        # Only the 10 smallest values are reported, so keep just those
+                        block_vals = np.unique(block)[:10]
+                        unique_vals = block_vals if unique_vals is None else np.union1d(unique_vals, block_vals)[:10]
+                    to_palette_indices(block, transparent,
+                                       indices[row:row + block_height, col:col + block_width])
+            
+            if counts is not None:
+                unique_vals = np.flatnonzero(counts)
+            print(f"  Data shape: {indices.shape}")
+            print(f"  Unique values: {unique_vals[:10]}...")
+            
+            # Create a palette PNG: one byte per pixel, with the palette
+            # alpha written as the tRNS chunk. fromarray shares memory with
+            # the contiguous uint8 index array rather than copying it
+            img = Image.fromarray(indices)
+            img.putpalette(palette.tobytes(), 'RGBA')
+            img.save(output, 'PNG', **PNG_SAVE_OPTIONS)
+            if OXIPNG:
+                optimize_png(output)
+            
+            # src is already WGS84, so its bounds are the image bounds
+            bounds = src.bounds
+            
+            write_cog(output.with_suffix('.tif'), indices, palette, bounds)
+            
+            print(f"  [OK] Created: {output.name}")
+            
+            return {
+                'id': layer['id'],
+                'title': layer['title'],
+                'category': layer['category'],
+                'year': layer.get('year'),
+                'description': layer['description'],
+                'image_path': f'/tiles/images/{layer["id"]}.png',
+                'cog_path': f'/tiles/images/{layer["id"]}.tif',
+                'bounds': {
+                    'west': bounds[0],
+                    'south': bounds[1],
+                    'east': bounds[2],
+                    'north': bounds[3]
+                }
+            }
+            
+    except Exception as e:
+        print(f"  Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
@@ -0,0 +1,201 @@
+"""
+Shared configuration and driver for the large-raster image scripts.
+
+Holds the large Western Ghats-wide layer definitions, the output paths and
+the manifest merge, and sends each layer to one of two backends:
+large_rasters_rasterio (windowed rasterio reads, low overhead on moderate
+rasters) or large_rasters_gdal (GDAL's multithreaded warper, for very large
+rasters).
+"""
+
+import importlib.util
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+
+WORKSPACE = Path(r"c:\Users\trkumar\OneDrive - Deloitte (O365D)\Documents\Research\Western Ghats")
+OUTPUT_DIR = WORKSPACE / "field-validator-app" / "public" / "tiles" / "images"
+TEMP_DIR = WORKSPACE / "field-validator-app" / "temp_tiles"
+
+# GDAL tuning for large block-based reads; must be set before GDAL initializes
+for key, value in {
+    'GDAL_CACHEMAX': '1024',             # MB
+    'GDAL_NUM_THREADS': 'ALL_CPUS',
+    'GDAL_SWATH_SIZE': '536870912',      # bytes
+    'GDAL_TIFF_INTERNAL_MASK': 'YES',
+    'VSI_CACHE': 'TRUE',
+    'VSI_CACHE_SIZE': '268435456',       # bytes
+}.items():
+    os.environ.setdefault(key, value)
+
+HAS_RASTERIO = importlib.util.find_spec('rasterio') is not None
+HAS_GDAL = importlib.util.find_spec('osgeo') is not None
+
+# Rasters with at least this many pixels go through the GDAL backend
+LARGE_RASTER_PIXELS = 50_000_000
+
+# Threads a single layer may use; init_worker lowers it inside pool workers
+WORKER_THREADS = os.cpu_count() or 1
+
+# Large raster layers that need special handling
+LARGE_LAYERS = [
+    {
+        'id': 'plantations',
+        'title': 'Plantations (All)',
+        'source': WORKSPACE / "gdrive_exports" / "Forest Classification" / "plantations_all_20251214_121720.tif",
+        'category': 'forest',
+        'description': 'All identified plantation areas across Western Ghats',
+        'color': (154, 205, 50, 180)  # Yellow-green RGBA
+    },
+    {
+        'id': 'natural_forest_80',
+        'title': 'Natural Forest (80% confidence)',
+        'source': WORKSPACE / "gdrive_exports" / "Forest Classification" / "natural_forest_high_conf_80pct_20251214_121720.tif",
+        'category': 'forest',
+        'description': 'Natural forest with 80%+ confidence',
+        'color': (0, 100, 0, 180)  # Dark green
+    },
+    {
+        'id': 'natural_forest_52',
+        'title': 'Natural Forest (52% threshold)',
+        'source': WORKSPACE / "gdrive_exports" / "Forest Classification" / "natural_forest_threshold_52pct_20251214_121720.tif",
+        'category': 'forest',
+        'description': 'Natural forest at 52% threshold',
+        'color': (34, 139, 34, 180)  # Forest green
+    },
+    {
+        'id': 'old_growth',
+        'title': 'Old Growth Forest',
+        'source': WORKSPACE / "gdrive_exports" / "Forest Classification" / "old_growth_natural_forest_20251214_121720.tif",
+        'category': 'forest',
+        'description': 'Identified old growth natural forest',
+        'color': (0, 77, 0, 180)  # Very dark green
+    },
+    {
+        'id': 'forest_typology',
+        'title': 'Forest Typology Composite',
+        'source': WORKSPACE / "gdrive_exports" / "Forest Classification" / "forest_typology_composite_20251214_121720.tif",
+        'category': 'forest',
+        'description': 'Composite forest classification: 1=Natural High, 2=Natural Low, 3=Plantation, 4=Other',
+        'colors': {
+            1: (0, 100, 0, 180),    # Natural forest high conf - dark green
+            2: (34, 139, 34, 180),   # Natural forest low conf - forest green
+            3: (154, 205, 50, 180),  # Plantation - yellow-green
+            4: (144, 238, 144, 180)  # Other forest - light green
+        }
+    },
+]
+
+
+def init_worker(workers):
+    """
+    Pool initializer: split the cores and the GDAL cache budgets evenly
+    between the workers, so concurrent layers don't each claim every core
+    and a full-size cache.
+    """
+    global WORKER_THREADS
+    WORKER_THREADS = max(1, (os.cpu_count() or 1) // workers)
+    os.environ['GDAL_NUM_THREADS'] = str(WORKER_THREADS)
+    for key in ('GDAL_CACHEMAX', 'VSI_CACHE_SIZE'):
+        if os.environ.get(key, '').isdigit():
+            os.environ[key] = str(max(1, int(os.environ[key]) // workers))
+
+
+def raster_pixels(source):
+    """Pixel count of a raster, read from its header"""
+    if HAS_RASTERIO:
+        import rasterio
+        with rasterio.open(source) as src:
+            return src.width * src.height
+    
+    from osgeo import gdal
+    gdal.UseExceptions()
+    ds = gdal.Open(str(source))
+    return ds.RasterXSize * ds.RasterYSize
+
+
+def choose_backend(layer):
+    """Pick 'rasterio' or 'gdal' for a layer from its raster size and the installed packages"""
+    if not HAS_GDAL or not layer['source'].exists():
+        return 'rasterio'
+    if not HAS_RASTERIO:
+        return 'gdal'
+    return 'gdal' if raster_pixels(layer['source']) >= LARGE_RASTER_PIXELS else 'rasterio'
+
+
+def process_layer(layer, output_dir, backend='auto'):
+    """Render one layer with the given backend ('auto' picks one by raster size)"""
+    if backend == 'auto':
+        backend = choose_backend(layer)
+    
+    if backend == 'gdal':
+        from large_rasters_gdal import create_colored_png_with_gdal
+        return create_colored_png_with_gdal(layer, output_dir)
+    
+    from large_rasters_rasterio import process_large_raster
+    return process_large_raster(layer, output_dir)
+
+
+def update_manifest(results, output_dir):
+    """Merge layer results into image-manifest.json, replacing entries with the same id"""
+    manifest_path = output_dir / 'image-manifest.json'
+    if manifest_path.exists():
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    else:
+        manifest = {'version': '1.0', 'layers': []}
+    
+    # Add new layers (avoiding duplicates)
+    existing_ids = {l['id'] for l in manifest['layers']}
+    for result in results:
+        if result['id'] not in existing_ids:
+            manifest['layers'].append(result)
+        else:
+            # Update existing
+            for i, l in enumerate(manifest['layers']):
+                if l['id'] == result['id']:
+                    manifest['layers'][i] = result
+                    break
+    
+    # Only rewrite when the content changes (avoids needless sync uploads of
+    # the OneDrive workspace), via a temp file + os.replace so an interrupted
+    # run never leaves a truncated manifest
+    new_text = json.dumps(manifest, indent=2)
+    if manifest_path.exists() and manifest_path.read_text() == new_text:
+        print(f"\nManifest unchanged: {manifest_path}")
+    else:
+        tmp_path = manifest_path.with_suffix('.json.tmp')
+        tmp_path.write_text(new_text)
+        os.replace(tmp_path, manifest_path)
+        print(f"\nManifest updated: {manifest_path}")
+    print(f"Total layers in manifest: {len(manifest['layers'])}")
+
+
+def main(backend='auto', title="Large Raster Processing"):
+    print("=" * 60)
+    print(title)
+    print("=" * 60)
+    
+    required = {'rasterio': HAS_RASTERIO, 'gdal': HAS_GDAL}
+    if backend == 'auto' and not (HAS_RASTERIO or HAS_GDAL):
+        print("Neither rasterio nor the GDAL Python bindings are installed.")
+        print("Install with: pip install rasterio pillow numpy")
+        return
+    if backend != 'auto' and not required[backend]:
+        print(f"The {backend} backend is not installed.")
+        return
+    
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    
+    # Layers are independent, so process them concurrently; map() keeps
+    # results in layer order and the manifest is written here only
+    workers = min(len(LARGE_LAYERS), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(workers,)) as executor:
+        results = [result for result in executor.map(process_layer, LARGE_LAYERS, repeat(OUTPUT_DIR), repeat(backend))
+                   if result]
+    
+    print(f"\n[OK] Processed {len(results)} / {len(LARGE_LAYERS)} layers")
+    
+    update_manifest(results, OUTPUT_DIR)